@@ -1,19 +1,21 @@
 
 #!/usr/bin/env python3
-import json
 import os
-import re
 import time
 import logging
-import requests
+from logging.handlers import RotatingFileHandler
 import shutil
+import hashlib
+import functools
 import asyncio
 import aiohttp
-from aiofiles import open as aio_open
+import orjson
 from datetime import datetime
-import webbrowser
 import sys
+import threading
 import subprocess
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QLabel, QLineEdit, QProgressBar, QFileDialog, QMessageBox, QGroupBox, QSizePolicy
@@ -33,211 +35,604 @@ APP_DIR = get_app_dir()
 
 SETTINGS_FILE = os.path.join(APP_DIR, "settings.json")
 CACHE_FILE = os.path.join(APP_DIR, "additional_data.json")
-CACHE_TIMESTAMP_FILE = os.path.join(APP_DIR, "additional_data.timestamp")
+CACHE_VALIDATORS_FILE = os.path.join(APP_DIR, "additional_data.validators.json")
+CACHE_IDHASH_FILE = os.path.join(APP_DIR, "additional_data.idhash")
 CACHE_EXPIRY_SECONDS = 24 * 60 * 60
+MAX_CONCURRENT_DOWNLOADS = 16
+MAX_CONCURRENT_VIDEOS = 4
+MAX_NVENC_SESSIONS = 2
+MAX_COPY_HEIGHT = 720
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+IMAGE_INDEX_FILENAME = ".image_sources.json"
+MISSING_INDEX_FILENAME = ".missing_images.json"
+_SH_TEMPLATE = (
+    "#!/bin/bash\n"
+    "flatpak run --socket=wayland --env=ELECTRON_ENABLE_WAYLAND=1 io.github.unknownskl.greenlight --fullscreen --connect='xcloud_{}'\n"
+).format
+WANTED_IMAGE_PURPOSES = frozenset({"Logo", "Poster", "BoxArt"})
+HERO_IMAGE_PRIORITY = {"TitledHeroArt": 0, "SuperHeroArt": 1}
+GAMELIST_OPTIONAL_FIELDS = [
+    ("DeveloperName", "developer"),
+    ("Publisher", "publisher"),
+    ("Genre", "genre"),
+    ("Players", "players"),
+    ("playcount", "playcount"),
+    ("lastplayed", "lastplayed"),
+]
+CATALOG_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=3.05, sock_read=10)
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+CATALOG_RETRIES = 3
+CATALOG_BATCH_SIZE = 40
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+TRANSIENT_CLIENT_STATUSES = frozenset({408, 429})
+CLEAN_WORKERS = 8
+THEME_CACHE_DIR = os.path.join(APP_DIR, "theme_cache")
+THEME_SVG_URL = "https://raw.githubusercontent.com/Boc86/xboxgp_esde_sync/main/themes/gp_logo.svg"
+THEME_FANART_URL = "https://raw.githubusercontent.com/Boc86/xboxgp_esde_sync/main/themes/gp_fanart.jpg"
+_TITLE_STRIP_CHARS = bytes(c for c in range(128) if not chr(c).isalnum())
 
-def check_and_clear_log_file():
-    log_file = os.path.join(APP_DIR, "xboxgames_debug.log")
-    max_size = 1024 * 1024
-    if os.path.exists(log_file) and os.path.getsize(log_file) >= max_size:
-        with open(log_file, 'w') as f:
-            f.write("")
-
-check_and_clear_log_file()
 logging.basicConfig(
     level=logging.DEBUG,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(os.path.join(APP_DIR, "xboxgames_debug.log")),
+        RotatingFileHandler(
+            os.path.join(APP_DIR, "xboxgames_debug.log"), maxBytes=1024 * 1024, backupCount=1, encoding="utf-8"
+        ),
         logging.StreamHandler()
     ]
 )
 
+@functools.cache
 def check_ffmpeg():
-    if not shutil.which("ffmpeg"):
+    ffmpeg_path = shutil.which("ffmpeg")
+    if not ffmpeg_path:
         raise EnvironmentError("ffmpeg is not installed or not in PATH. Please install ffmpeg to proceed.")
+    return ffmpeg_path
+
+@functools.cache
+def find_ffprobe():
+    return shutil.which("ffprobe")
+
+@functools.cache
+def has_nvenc():
+    try:
+        result = subprocess.run(
+            [check_ffmpeg(), "-hide_banner", "-loglevel", "error", "-init_hw_device", "cuda",
+             "-f", "lavfi", "-i", "color=black:s=1280x720", "-frames:v", "1",
+             "-vf", "format=nv12,hwupload_cuda,scale_cuda=640:480", "-c:v", "h264_nvenc", "-f", "null", "-"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15
+        )
+        available = result.returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        available = False
+    logging.info(f"NVENC hardware encoding {'available' if available else 'not available'}")
+    return available
 
 def is_cache_valid():
-    if not os.path.exists(CACHE_FILE) or not os.path.exists(CACHE_TIMESTAMP_FILE):
+    try:
+        return time.time() - os.stat(CACHE_FILE).st_mtime < CACHE_EXPIRY_SECONDS
+    except OSError:
         return False
+
+def sanitize_title(title):
+    return title.encode("ascii", "ignore").translate(None, _TITLE_STRIP_CHARS).decode("ascii").upper()
+
+_CATALOG_MEMO = {}
+
+def remember_catalog(data):
+    stat = os.stat(CACHE_FILE)
+    for entry in data:
+        entry["_sanitized"] = sanitize_title(entry.get("ProductTitle") or "Unknown")
+    _CATALOG_MEMO["data"] = data
+    _CATALOG_MEMO["key"] = (stat.st_ino, stat.st_size)
+    return data
+
+def load_catalog_cache():
+    stat = os.stat(CACHE_FILE)
+    if _CATALOG_MEMO.get("key") != (stat.st_ino, stat.st_size):
+        remember_catalog(_read_json(CACHE_FILE))
+    return _CATALOG_MEMO["data"]
+
+def store_catalog(data):
+    _write_json(CACHE_FILE, data)
+    return remember_catalog(data)
+
+def load_cache_validators():
+    if not os.path.exists(CACHE_FILE) or not os.path.exists(CACHE_VALIDATORS_FILE):
+        return {}
     try:
-        with open(CACHE_TIMESTAMP_FILE, "r") as f:
-            timestamp = float(f.read().strip())
-        if time.time() - timestamp < CACHE_EXPIRY_SECONDS:
-            return True
+        return _read_json(CACHE_VALIDATORS_FILE)
     except Exception as e:
-        logging.warning(f"Could not read cache timestamp: {e}")
-    return False
+        logging.warning(f"Could not read cache validators: {e}")
+        return {}
+
+async def fetch_json(session, url, headers=None):
+    for attempt in range(CATALOG_RETRIES + 1):
+        try:
+            async with session.get(url, headers=headers, timeout=CATALOG_TIMEOUT, raise_for_status=False) as response:
+                if response.status not in RETRY_STATUSES or attempt == CATALOG_RETRIES:
+                    if response.status == 304:
+                        return None, response.headers
+                    response.raise_for_status()
+                    return orjson.loads(await response.read()), response.headers
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == CATALOG_RETRIES:
+                raise
+            logging.warning(f"Retrying {url} after error: {e!r}")
+        await asyncio.sleep(0.5 * 2 ** attempt)
 
-def update_cache_timestamp():
-    with open(CACHE_TIMESTAMP_FILE, "w") as f:
-        f.write(str(time.time()))
+def hash_ids(ids_string):
+    return hashlib.blake2b(ids_string.encode(), digest_size=16).hexdigest()
+
+def load_sync_state():
+    if not os.path.exists(CACHE_FILE) or not os.path.exists(CACHE_IDHASH_FILE):
+        return {}
+    try:
+        state = _read_json(CACHE_IDHASH_FILE)
+    except Exception as e:
+        logging.warning(f"Could not read sync state: {e}")
+        return {}
+    return state if isinstance(state, dict) else {}
 
-def fetch_ids():
+async def fetch_ids(session, validators=None):
     url = "https://catalog.gamepass.com/sigls/v2?id=fdd9e2a7-0fee-49f6-ad69-4354098401ff&language=en-us&market=GB"
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data, response_headers = await fetch_json(session, url, headers)
+        if data is None:
+            return None, validators
         ids = [item['id'] for item in data if 'id' in item]
         ids_string = ",".join(ids)
-        return ids_string
-    except requests.exceptions.RequestException as e:
+        new_validators = {
+            key: value for key, value in (
+                ("etag", response_headers.get("ETag")),
+                ("last_modified", response_headers.get("Last-Modified")),
+            ) if value
+        }
+        return ids_string, new_validators
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logging.error(f"Error fetching IDs: {e}")
         raise
 
-def save_additional_data_to_json(id_strings):
+async def fetch_catalog_products(session, id_strings):
     base_url = "https://displaycatalog.mp.microsoft.com/v7.0/products?bigIds=INSERT&market=GB&languages=en-us&MS-CV=DGU1mcuYo0WMMp+F.1"
-    url = base_url.replace("INSERT", id_strings)
+    ids = [product_id for product_id in id_strings.split(",") if product_id]
+    urls = [
+        base_url.replace("INSERT", ",".join(ids[i:i + CATALOG_BATCH_SIZE]))
+        for i in range(0, len(ids), CATALOG_BATCH_SIZE)
+    ]
+    responses = await gather_or_cancel([fetch_json(session, url) for url in urls])
+    return [item for data, _ in responses for item in data.get("Products", [])]
+
+def extract_catalog_entries(products):
+    extracted_data = []
+    for item in products:
+        lp = (item.get("LocalizedProperties") or [None])[0] or {}
+        mp = (item.get("MarketProperties") or [None])[0] or {}
+        images = {}
+        heroes = {}
+        for image in lp.get("Images", []):
+            purpose = image.get("ImagePurpose")
+            if purpose in WANTED_IMAGE_PURPOSES:
+                images[purpose] = image.get("Uri")
+            elif purpose in HERO_IMAGE_PRIORITY:
+                heroes[HERO_IMAGE_PRIORITY[purpose]] = image.get("Uri")
+        if heroes:
+            images["TitledHeroArt"] = heroes[min(heroes)]
+        entry = {
+            "ProductId": item.get("ProductId"),
+            "ProductTitle": lp.get("ProductTitle"),
+            "ShortDescription": lp.get("ShortDescription"),
+            "DeveloperName": lp.get("DeveloperName"),
+            "OriginalReleaseDate": mp.get("OriginalReleaseDate"),
+            "Images": images,
+            "DASH": next((video.get("DASH") for video in lp.get("CMSVideos", []) if video.get("DASH")), None)
+        }
+        extracted_data.append(entry)
+    return extracted_data
+
+async def fetch_additional_data(session, id_strings):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        extracted_data = []
-        for item in data.get("Products", []):
-            images = {}
-            titled_hero_found = False
-            for image in item.get("LocalizedProperties", [{}])[0].get("Images", []):
-                purpose = image.get("ImagePurpose")
-                if purpose in ["Logo", "Poster", "BoxArt"]:
-                    images[purpose] = image.get("Uri")
-                elif purpose == "TitledHeroArt":
-                    images["TitledHeroArt"] = image.get("Uri")
-                    titled_hero_found = True
-                elif purpose == "SuperHeroArt" and not titled_hero_found:
-                    images["TitledHeroArt"] = image.get("Uri")
-            entry = {
-                "ProductId": item.get("ProductId"),
-                "ProductTitle": item.get("LocalizedProperties", [{}])[0].get("ProductTitle"),
-                "ShortDescription": item.get("LocalizedProperties", [{}])[0].get("ShortDescription"),
-                "DeveloperName": item.get("LocalizedProperties", [{}])[0].get("DeveloperName"),
-                "OriginalReleaseDate": item.get("MarketProperties", [{}])[0].get("OriginalReleaseDate"),
-                "Images": images,
-                "DASH": next((video.get("DASH") for video in item.get("LocalizedProperties", [{}])[0].get("CMSVideos", []) if video.get("DASH")), None)
-            }
-            extracted_data.append(entry)
-        output_path = CACHE_FILE
-        with open(output_path, "w", encoding="utf-8") as json_file:
-            json.dump(extracted_data, json_file, indent=4)
-        update_cache_timestamp()
-    except requests.exceptions.RequestException as e:
+        products = await fetch_catalog_products(session, id_strings)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logging.error(f"Error fetching additional data: {e}")
         raise
+    extracted_data = await asyncio.to_thread(extract_catalog_entries, products)
+    return await asyncio.to_thread(store_catalog, extracted_data)
 
-def download_video(dash_url, output_path):
+def _write_script(path, content):
     try:
-        command = f'ffmpeg -i "{dash_url}" -vf scale=640:480 -preset fast -c:a copy "{output_path}"'
-        process = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if process.returncode != 0:
-            logging.error(f"ffmpeg failed for {dash_url} with error: {process.stderr.decode().strip()}")
-            return False
-        return True
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o755)
+    except FileExistsError:
+        return False
+    try:
+        os.write(fd, content.encode("utf-8"))
+    finally:
+        os.close(fd)
+    return True
+
+def _atomic_write(path, data_bytes):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _write_json(path, data, option=None):
+    _atomic_write(path, orjson.dumps(data, option=option))
+
+def _write_xml(path, root):
+    _atomic_write(path, ET.tostring(root, encoding="utf-8", xml_declaration=True))
+
+def _read_json(path):
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+async def probe_copy_stream(dash_url):
+    ffprobe_path = find_ffprobe()
+    if not ffprobe_path:
+        logging.debug(f"ffprobe not found; skipping stream copy for {dash_url}")
+        return None
+    command = [
+        ffprobe_path, "-v", "quiet", "-print_format", "json", "-show_streams", "-select_streams", "v", dash_url
+    ]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError as e:
+        logging.debug(f"ffprobe unavailable for {dash_url}: {e}")
+        return None
+    try:
+        stdout, _ = await process.communicate()
+    finally:
+        if process.returncode is None:
+            process.terminate()
+            await process.wait()
+    if process.returncode != 0:
+        return None
+    try:
+        probed = orjson.loads(stdout)
+    except orjson.JSONDecodeError as e:
+        logging.debug(f"Unreadable ffprobe output for {dash_url}: {e}")
+        return None
+    if not isinstance(probed, dict):
+        return None
+    streams = [
+        stream for stream in probed.get("streams", [])
+        if isinstance(stream, dict) and stream.get("codec_name") == "h264" and 0 < (stream.get("height") or 0) <= MAX_COPY_HEIGHT
+    ]
+    if not streams:
+        return None
+    return max(streams, key=lambda stream: stream["height"])["index"]
+
+def video_command(dash_url, output_path, encoder, threads=1, copy_stream=None):
+    ffmpeg_path = check_ffmpeg()
+    if encoder == "copy":
+        return [
+            ffmpeg_path, "-nostdin", "-loglevel", "error", "-i", dash_url,
+            "-map", f"0:{copy_stream}", "-map", "0:a:0?", "-c", "copy", "-bsf:a", "aac_adtstoasc", output_path
+        ]
+    if encoder == "h264_nvenc":
+        return [
+            ffmpeg_path, "-nostdin", "-loglevel", "error", "-hwaccel", "cuda", "-hwaccel_output_format", "cuda",
+            "-i", dash_url, "-vf", "scale_cuda=640:480", "-c:v", "h264_nvenc", "-preset", "p4",
+            "-rc", "vbr", "-cq", "23", "-c:a", "copy", output_path
+        ]
+    return [
+        ffmpeg_path, "-nostdin", "-loglevel", "error", "-i", dash_url,
+        "-vf", "scale=640:480", "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+        "-threads", str(threads), "-c:a", "copy", output_path
+    ]
+
+async def run_ffmpeg(command, dash_url, output_path, encoder):
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
     except Exception as e:
         logging.error(f"Exception occurred while converting {dash_url} to MP4: {e}")
         return False
+    try:
+        _, stderr = await process.communicate()
+    finally:
+        if process.returncode is None:
+            process.terminate()
+            await process.wait()
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    if process.returncode != 0:
+        logging.error(f"ffmpeg ({encoder}) failed for {dash_url} with error: {stderr.decode(errors='replace').strip()}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+    return True
+
+async def download_video(dash_url, output_path, sem, threads=1, nvenc=False):
+    async with sem:
+        try:
+            copy_stream = await probe_copy_stream(dash_url)
+            encoders = (["copy"] if copy_stream is not None else []) + (["h264_nvenc"] if nvenc else []) + ["libx264"]
+            for encoder in encoders:
+                logging.info(f"Converting {output_path} with {encoder}")
+                command = video_command(dash_url, output_path, encoder, threads, copy_stream)
+                if await run_ffmpeg(command, dash_url, output_path, encoder):
+                    return True
+        except Exception as e:
+            logging.error(f"Unexpected error converting {dash_url} to MP4: {e!r}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        return False
+
+async def download_image(session, url, path, record, missing_images):
+    headers = {}
+    if record.get("etag"):
+        headers["If-None-Match"] = record["etag"]
+    if record.get("last_modified"):
+        headers["If-Modified-Since"] = record["last_modified"]
+    request_url = "https:" + url if url.startswith("//") else url
+    try:
+        response = await session.get(request_url, headers=headers)
+    except aiohttp.ClientResponseError as e:
+        if 400 <= e.status < 500 and e.status not in TRANSIENT_CLIENT_STATUSES:
+            missing_images[url] = time.time()
+            logging.debug(f"Image request for {url} failed with HTTP {e.status}")
+            return False
+        raise
+    async with response:
+        if response.status == 304:
+            record["checked"] = time.time()
+            return False
+        part_path = path + ".part"
+        try:
+            with open(part_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(part_path, path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        record["etag"] = response.headers.get("ETag")
+        record["last_modified"] = response.headers.get("Last-Modified")
+        record["checked"] = time.time()
+    return True
+
+def entry_images(entry, sanitized_title):
+    images = entry.get("Images", {})
+    file_name = f"{sanitized_title}.png"
+    jobs = []
+    logo_url = images.get("Logo") or images.get("Poster")
+    if logo_url:
+        jobs.append(("logo", os.path.join("marquees", file_name), logo_url))
+    if images.get("Poster"):
+        jobs.append(("poster", os.path.join("covers", file_name), images["Poster"]))
+    if images.get("TitledHeroArt"):
+        jobs.append(("fanart", os.path.join("fanart", file_name), images["TitledHeroArt"]))
+    return jobs
+
+def scan_names(dir_path, suffix):
+    try:
+        with os.scandir(dir_path) as it:
+            return {e.name for e in it if e.name.endswith(suffix)}
+    except FileNotFoundError:
+        return set()
+
+def load_image_index(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        image_index = _read_json(path)
+    except Exception as e:
+        logging.warning(f"Could not read image index {path}: {e}")
+        return {}
+    if not isinstance(image_index, dict):
+        logging.warning(f"Ignoring malformed image index {path}")
+        return {}
+    return {
+        rel_path: record if isinstance(record, dict) else {"url": record}
+        for rel_path, record in image_index.items()
+        if isinstance(record, (dict, str))
+    }
+
+def load_missing_index(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        missing_images = _read_json(path)
+    except Exception as e:
+        logging.warning(f"Could not read missing-image index {path}: {e}")
+        return {}
+    if not isinstance(missing_images, dict):
+        logging.warning(f"Ignoring malformed missing-image index {path}")
+        return {}
+    now = time.time()
+    return {
+        url: failed_at for url, failed_at in missing_images.items()
+        if isinstance(failed_at, (int, float)) and now - failed_at < CACHE_EXPIRY_SECONDS
+    }
 
-async def download_image(session, url, path):
-    if url.startswith("//"):
-        url = "https:" + url
-    async with session.get(url) as response:
-        if response.status == 200:
-            content = await response.read()
-            async with aio_open(path, "wb") as f:
-                await f.write(content)
-
-async def process_entry(entry, session, valid_titles, files_created, output_dir, marquee_dir, cover_dir, fanart_dir):
-    product_title = entry.get("ProductTitle", "Unknown")
-    sanitized_title = re.sub(r"[^a-zA-Z0-9]", "", product_title).upper()
-    valid_titles.add(sanitized_title)
-    for subdir in [marquee_dir, cover_dir, fanart_dir]:
-        os.makedirs(subdir, exist_ok=True)
+def is_image_current(rel_path, url, image_index, existing_images):
+    if rel_path not in existing_images:
+        return False
+    record = image_index.setdefault(rel_path, {"url": url})
+    if record.get("url") != url:
+        return False
+    if not record.get("etag") and not record.get("last_modified"):
+        return True
+    return time.time() - record.get("checked", 0) < CACHE_EXPIRY_SECONDS
+
+async def create_script(sanitized_title, output_dir, files_created, existing_sh):
     file_path = os.path.join(output_dir, f"{sanitized_title}.sh")
-    if not os.path.exists(file_path):
-        script_name = f"xcloud_{sanitized_title}"
-        async with aio_open(file_path, "w", encoding="utf-8") as sh_file:
-            await sh_file.write("#!/bin/bash\n")
-            await sh_file.write(
-                f"flatpak run --socket=wayland --env=ELECTRON_ENABLE_WAYLAND=1 io.github.unknownskl.greenlight --fullscreen --connect='{script_name}'\n"
-            )
-        os.chmod(file_path, 0o755)
+    if await asyncio.to_thread(_write_script, file_path, _SH_TEMPLATE(sanitized_title)):
         files_created["sh"] += 1
-    logo_url = entry.get("Images", {}).get("Logo")
-    poster_url = entry.get("Images", {}).get("Poster")
-    logo_image_path = os.path.join(marquee_dir, f"{sanitized_title}.png")
-    if not os.path.exists(logo_image_path):
-        if logo_url:
-            await download_image(session, logo_url, logo_image_path)
-            files_created["logo"] += 1
-        elif poster_url:
-            await download_image(session, poster_url, logo_image_path)
-            files_created["logo"] += 1
-    if poster_url:
-        poster_image_path = os.path.join(cover_dir, f"{sanitized_title}.png")
-        if not os.path.exists(poster_image_path):
-            await download_image(session, poster_url, poster_image_path)
-            files_created["poster"] += 1
-    superhero_url = entry.get("Images", {}).get("TitledHeroArt")
-    if superhero_url:
-        fanart_path = os.path.join(fanart_dir, f"{sanitized_title}.png")
-        if not os.path.exists(fanart_path):
-            await download_image(session, superhero_url, fanart_path)
-            files_created["fanart"] += 1
+    existing_sh.add(f"{sanitized_title}.sh")
+
+async def image_worker(queue, session, assets_dir, image_index, missing_images, existing_images, files_created, files_failed, on_done=None):
+    while True:
+        job = await queue.get()
+        if job is None:
+            return
+        kind, rel_path, url, record = job
+        try:
+            if await download_image(session, url, os.path.join(assets_dir, rel_path), record, missing_images):
+                existing_images.add(rel_path)
+                files_created[kind] += 1
+            if "checked" in record:
+                image_index[rel_path] = record
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logging.error(f"Failed to download {url}: {e}")
+            files_failed["image"] += 1
+        if on_done:
+            on_done()
 
 async def generate_gamelist(output_dir, gamelist_path, metadata_dict):
-    entries = []
-    for file_name in sorted(os.listdir(output_dir)):
-        if file_name.endswith('.sh'):
-            sanitized_title = file_name[:-3]
-            meta = metadata_dict.get(sanitized_title, {})
-            game_entry = '    <game>\n'
-            game_entry += f'        <path>./{file_name}</path>\n'
-            game_entry += f'        <name>{meta.get("ProductTitle", sanitized_title)}</name>\n'
-            game_entry += f'        <desc>{meta.get("ShortDescription", "")}</desc>\n'
-            if meta.get("rating"):
-                game_entry += f'        <rating>{meta["rating"]}</rating>\n'
-            if meta.get("OriginalReleaseDate"):
-                try:
-                    date_obj = datetime.strptime(meta["OriginalReleaseDate"].split('T')[0], "%Y-%m-%d")
-                    release_date = date_obj.strftime("%Y%m%d")
-                    game_entry += f'        <releasedate>{release_date}T000000</releasedate>\n'
-                except Exception:
-                    pass
-            if meta.get("DeveloperName"):
-                game_entry += f'        <developer>{meta["DeveloperName"]}</developer>\n'
-            if meta.get("Publisher"):
-                game_entry += f'        <publisher>{meta["Publisher"]}</publisher>\n'
-            if meta.get("Genre"):
-                game_entry += f'        <genre>{meta["Genre"]}</genre>\n'
-            if meta.get("Players"):
-                game_entry += f'        <players>{meta["Players"]}</players>\n'
-            if meta.get("playcount"):
-                game_entry += f'        <playcount>{meta["playcount"]}</playcount>\n'
-            if meta.get("lastplayed"):
-                game_entry += f'        <lastplayed>{meta["lastplayed"]}</lastplayed>\n'
-            game_entry += '    </game>'
-            entries.append(game_entry)
-    xml_content = '<?xml version="1.0"?>\n<gameList>\n' + '\n'.join(entries) + '\n</gameList>'
-    async with aio_open(gamelist_path, "w", encoding="utf-8") as f:
-        await f.write(xml_content)
+    with os.scandir(output_dir) as it:
+        file_names = sorted(e.name for e in it if e.name.endswith('.sh'))
+    root = ET.Element("gameList")
+    for file_name in file_names:
+        sanitized_title = file_name[:-3]
+        meta = metadata_dict.get(sanitized_title, {})
+        game = ET.SubElement(root, "game")
+        ET.SubElement(game, "path").text = f"./{file_name}"
+        ET.SubElement(game, "name").text = str(meta.get("ProductTitle") or sanitized_title)
+        ET.SubElement(game, "desc").text = str(meta.get("ShortDescription") or "")
+        if meta.get("rating"):
+            ET.SubElement(game, "rating").text = str(meta["rating"])
+        if meta.get("OriginalReleaseDate"):
+            try:
+                date_obj = datetime.strptime(meta["OriginalReleaseDate"].split('T')[0], "%Y-%m-%d")
+                ET.SubElement(game, "releasedate").text = date_obj.strftime("%Y%m%dT000000")
+            except Exception:
+                pass
+        for key, tag in GAMELIST_OPTIONAL_FIELDS:
+            if meta.get(key):
+                ET.SubElement(game, tag).text = str(meta[key])
+    ET.indent(root, space="    ")
+    await asyncio.to_thread(_write_xml, gamelist_path, root)
 
-def ensure_greenlight_subdir(path):
+async def gather_or_cancel(aws):
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+def _purge(dir_path, suffix, valid_titles, counter_key, files_removed):
+    try:
+        with os.scandir(dir_path) as it:
+            victims = [e.path for e in it if e.name.endswith(suffix) and e.name[:-len(suffix)] not in valid_titles]
+    except FileNotFoundError:
+        return
+    files_removed[counter_key] += len(victims)
+    for p in victims:
+        os.unlink(p)
+
+def _collect_files(path):
+    files = []
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    files.append(entry.path)
+    return files
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.error(f"Failed to delete {path}: {e}")
+        return False
+    return True
+
+def greenlight_subdir(path):
     path = os.path.abspath(path)
     if not os.path.basename(path).lower() == "greenlight":
         path = os.path.join(path, "greenlight")
+    return path
+
+def ensure_greenlight_subdir(path):
+    path = greenlight_subdir(path)
     os.makedirs(path, exist_ok=True)
     return path
 
-def download_file_to_subfolder(parent_folder, subfolders, filename, url):
+def _makedirs(paths):
+    for path in paths:
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+
+def make_http_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=4, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.3)
+    ))
+    return session
+
+def fetch_theme_asset(session, filename, url):
+    import requests
+    cache_path = os.path.join(THEME_CACHE_DIR, filename)
+    validators_path = cache_path + ".validators.json"
+    headers = {}
+    if os.path.exists(cache_path) and os.path.exists(validators_path):
+        validators = _read_json(validators_path)
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    part_path = cache_path + ".part"
     try:
-        dest_dir = os.path.join(parent_folder, *subfolders)
+        with session.get(url, timeout=15, stream=True, headers=headers) as resp:
+            if resp.status_code == 304:
+                return cache_path
+            resp.raise_for_status()
+            os.makedirs(THEME_CACHE_DIR, exist_ok=True)
+            with open(part_path, 'wb', buffering=1 << 20) as f:
+                for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(part_path, cache_path)
+            _write_json(validators_path, {
+                key: value for key, value in (
+                    ("etag", resp.headers.get("ETag")),
+                    ("last_modified", resp.headers.get("Last-Modified")),
+                ) if value
+            })
+    except requests.RequestException as e:
+        if not headers:
+            raise
+        logging.warning(f"Could not revalidate {url}, using cached copy: {e}")
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return cache_path
+
+def download_file_to_subfolder(session, dest_dir, filename, url):
+    dest_path = os.path.join(dest_dir, filename)
+    part_path = dest_path + ".part"
+    try:
+        cache_path = fetch_theme_asset(session, filename, url)
         os.makedirs(dest_dir, exist_ok=True)
-        dest_path = os.path.join(dest_dir, filename)
-        resp = requests.get(url, timeout=15)
-        resp.raise_for_status()
-        with open(dest_path, 'wb') as f:
-            f.write(resp.content)
+        shutil.copyfile(cache_path, part_path)
+        os.replace(part_path, dest_path)
         return True, dest_path
     except Exception as e:
+        if os.path.exists(part_path):
+            os.remove(part_path)
         logging.error(f"Failed to download {url} to {dest_path}: {e}")
         return False, str(e)
 
@@ -245,83 +640,297 @@ async def main(base_dir, gamelist_dir, rom_dir, download_videos=False, progress_
     try:
         if progress_callback:
             progress_callback(5)
-        if not is_cache_valid():
-            if progress_callback:
-                progress_callback(10)
-            ids_string = fetch_ids()
+        connector = aiohttp.TCPConnector(
+            limit=64, limit_per_host=MAX_CONCURRENT_DOWNLOADS, ttl_dns_cache=600, keepalive_timeout=60
+        )
+        async with aiohttp.ClientSession(connector=connector, timeout=DOWNLOAD_TIMEOUT, raise_for_status=True) as session:
+            assets_dir = greenlight_subdir(base_dir)
+            games_dir = greenlight_subdir(rom_dir)
+            gamelist_folder = greenlight_subdir(gamelist_dir)
+            sync_settings = {
+                "assets_dir": assets_dir,
+                "games_dir": games_dir,
+                "gamelist_dir": gamelist_folder,
+                "download_videos": bool(download_videos),
+            }
+            validators = load_cache_validators()
+            sync_state = load_sync_state()
+            ids_hash = sync_state.get("ids")
+            settings_unchanged = all(sync_state.get(key) == value for key, value in sync_settings.items())
+            catalog_unchanged = False
+            metadata_list = None
+            cache_valid = is_cache_valid()
+            if validators or not cache_valid:
+                if progress_callback:
+                    progress_callback(10)
+                ids_string, validators = await fetch_ids(session, validators if cache_valid else None)
+                if progress_callback:
+                    progress_callback(20)
+                if ids_string is None:
+                    logging.info("Catalog not modified since last sync. Using cached catalog data.")
+                    catalog_unchanged = ids_hash is not None and settings_unchanged
+                elif hash_ids(ids_string) == ids_hash and cache_valid:
+                    logging.info("Catalog IDs unchanged since last sync. Using cached catalog data.")
+                    _write_json(CACHE_VALIDATORS_FILE, validators)
+                    catalog_unchanged = settings_unchanged
+                else:
+                    metadata_list = await fetch_additional_data(session, ids_string)
+                    _write_json(CACHE_VALIDATORS_FILE, validators)
+                    ids_hash = hash_ids(ids_string)
+            else:
+                logging.info("Cache files are valid. No need to download catalog data.")
+            if catalog_unchanged:
+                metadata_dict = {}
+                for entry in await asyncio.to_thread(load_catalog_cache):
+                    metadata_dict.setdefault(entry["_sanitized"], entry)
+                await asyncio.to_thread(_makedirs, [games_dir, gamelist_folder])
+                await generate_gamelist(games_dir, os.path.join(gamelist_folder, "gamelist.xml"), metadata_dict)
+                if progress_callback:
+                    progress_callback(100)
+                return
+            if os.path.exists(CACHE_IDHASH_FILE):
+                os.remove(CACHE_IDHASH_FILE)
             if progress_callback:
-                progress_callback(20)
-            save_additional_data_to_json(ids_string)
-        else:
-            logging.info("Cache files are valid. No need to download catalog data.")
-        if progress_callback:
-            progress_callback(40)
-        assets_dir = ensure_greenlight_subdir(base_dir)
-        games_dir = ensure_greenlight_subdir(rom_dir)
-        gamelist_folder = ensure_greenlight_subdir(gamelist_dir)
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            metadata_list = json.load(f)
-        metadata_dict = {}
-        for entry in metadata_list:
-            title = entry.get("ProductTitle", "")
-            sanitized_title = re.sub(r"[^a-zA-Z0-9]", "", title).upper()
-            metadata_dict[sanitized_title] = entry
-        valid_titles = set()
-        files_created = {"sh": 0, "logo": 0, "poster": 0, "fanart": 0}
-        marquee_dir = os.path.join(assets_dir, "marquees")
-        cover_dir = os.path.join(assets_dir, "covers")
-        fanart_dir = os.path.join(assets_dir, "fanart")
-        async with aiohttp.ClientSession() as session:
-            coros = []
+                progress_callback(40)
+            if metadata_list is None:
+                metadata_list = await asyncio.to_thread(load_catalog_cache)
+            metadata_dict = {}
+            valid_titles = set()
+            files_created = {"sh": 0, "logo": 0, "poster": 0, "fanart": 0, "video": 0}
+            files_failed = {"image": 0, "video": 0}
+            marquee_dir = os.path.join(assets_dir, "marquees")
+            cover_dir = os.path.join(assets_dir, "covers")
+            fanart_dir = os.path.join(assets_dir, "fanart")
+            video_dir = os.path.join(assets_dir, "videos")
+            await asyncio.to_thread(_makedirs, [
+                games_dir, gamelist_folder, marquee_dir, cover_dir, fanart_dir
+            ] + ([video_dir] if download_videos else []))
+            image_index_path = os.path.join(assets_dir, IMAGE_INDEX_FILENAME)
+            image_index = await asyncio.to_thread(load_image_index, image_index_path)
+            missing_index_path = os.path.join(assets_dir, MISSING_INDEX_FILENAME)
+            missing_images = await asyncio.to_thread(load_missing_index, missing_index_path)
+            existing_sh = scan_names(games_dir, ".sh")
+            existing_images = {
+                os.path.join(subdir, name)
+                for subdir in ("marquees", "covers", "fanart")
+                for name in scan_names(os.path.join(assets_dir, subdir), ".png")
+            }
+            script_coros = []
+            image_queue = asyncio.Queue()
             for entry in metadata_list:
-                coros.append(process_entry(entry, session, valid_titles, files_created, games_dir, marquee_dir, cover_dir, fanart_dir))
-            total = len(coros)
-            chunk = max(1, total // 20) if total else 1
-            for i in range(0, total, chunk):
-                await asyncio.gather(*coros[i:i + chunk])
+                sanitized_title = entry["_sanitized"]
+                if sanitized_title in valid_titles:
+                    continue
+                metadata_dict[sanitized_title] = entry
+                valid_titles.add(sanitized_title)
+                if f"{sanitized_title}.sh" not in existing_sh:
+                    script_coros.append(create_script(sanitized_title, games_dir, files_created, existing_sh))
+                for kind, rel_path, url in entry_images(entry, sanitized_title):
+                    if url in missing_images or is_image_current(rel_path, url, image_index, existing_images):
+                        continue
+                    record = image_index.get(rel_path, {})
+                    if rel_path not in existing_images or record.get("url") != url:
+                        record = {"url": url}
+                    image_queue.put_nowait((kind, rel_path, url, record))
+            total = image_queue.qsize()
+            images_done = 0
+            def image_done():
+                nonlocal images_done
+                images_done += 1
                 if progress_callback:
-                    progress_callback(40 + int(50 * i / total))
+                    progress_callback(40 + int(50 * images_done / total))
+            for _ in range(MAX_CONCURRENT_DOWNLOADS):
+                image_queue.put_nowait(None)
+            await gather_or_cancel(script_coros + [
+                image_worker(image_queue, session, assets_dir, image_index, missing_images, existing_images, files_created, files_failed, image_done)
+                for _ in range(MAX_CONCURRENT_DOWNLOADS)
+            ])
+        if download_videos:
+            video_jobs = []
+            for sanitized_title, entry in metadata_dict.items():
+                dash_url = entry.get("DASH")
+                if not dash_url:
+                    continue
+                video_path = os.path.join(video_dir, f"{sanitized_title}.mp4")
+                if not os.path.exists(video_path):
+                    video_jobs.append((dash_url, video_path))
+            if video_jobs:
+                try:
+                    check_ffmpeg()
+                except EnvironmentError as e:
+                    logging.error(f"Skipping {len(video_jobs)} video downloads: {e}")
+                    files_failed["video"] += len(video_jobs)
+                    video_jobs = []
+            if video_jobs:
+                nvenc = await asyncio.to_thread(has_nvenc)
+                cpu_count = os.cpu_count() or 4
+                if nvenc:
+                    video_workers = MAX_NVENC_SESSIONS
+                else:
+                    video_workers = max(1, min(MAX_CONCURRENT_VIDEOS, cpu_count))
+                threads_per_job = max(1, cpu_count // video_workers)
+                video_sem = asyncio.Semaphore(video_workers)
+                results = await gather_or_cancel([
+                    download_video(dash_url, video_path, video_sem, threads_per_job, nvenc)
+                    for dash_url, video_path in video_jobs
+                ])
+                files_created["video"] = sum(results)
+                files_failed["video"] += len(results) - sum(results)
+        if valid_titles:
+            files_removed = {"sh": 0, "logo": 0, "poster": 0, "fanart": 0, "video": 0}
+            await gather_or_cancel([
+                asyncio.to_thread(_purge, dir_path, suffix, valid_titles, counter_key, files_removed)
+                for dir_path, suffix, counter_key in [
+                    (games_dir, ".sh", "sh"),
+                    (marquee_dir, ".png", "logo"),
+                    (cover_dir, ".png", "poster"),
+                    (fanart_dir, ".png", "fanart"),
+                    (video_dir, ".mp4", "video"),
+                ]
+            ])
+            logging.info(f"Files created: {files_created}, files removed: {files_removed}")
+            image_index = {
+                rel_path: record for rel_path, record in image_index.items()
+                if os.path.splitext(os.path.basename(rel_path))[0] in valid_titles
+            }
+        await asyncio.to_thread(_write_json, image_index_path, image_index)
+        await asyncio.to_thread(_write_json, missing_index_path, missing_images)
         gamelist_path = os.path.join(gamelist_folder, "gamelist.xml")
         await generate_gamelist(games_dir, gamelist_path, metadata_dict)
+        if any(files_failed.values()):
+            logging.warning(f"Sync finished with failures: {files_failed}. The next sync will retry them.")
+        elif ids_hash:
+            await asyncio.to_thread(_write_json, CACHE_IDHASH_FILE, {"ids": ids_hash, **sync_settings})
         if progress_callback:
             progress_callback(100)
     except Exception as e:
         logging.error(f"Exception in main(): {e}")
         raise
 
+def add_greenlight_system(custom_systems_path, games_dir):
+    root = ET.parse(custom_systems_path).getroot()
+    if root.tag.lower() != "systemlist":
+        systemlist = root.find("systemList")
+        if systemlist is None:
+            systemlist = ET.Element("systemList")
+            systemlist.extend(list(root))
+    else:
+        systemlist = root
+    exists = any(
+        system.find('name') is not None and system.find('name').text.strip().lower() == "greenlight"
+        for system in systemlist.findall('system')
+    )
+    if exists:
+        return False
+    system_elem = ET.SubElement(systemlist, "system")
+    ET.SubElement(system_elem, "name").text = "greenlight"
+    ET.SubElement(system_elem, "fullname").text = "Xbox Game Pass"
+    ET.SubElement(system_elem, "path").text = f'bash "{games_dir}"'
+    ET.SubElement(system_elem, "extension").text = ".sh"
+    command_elem = ET.SubElement(system_elem, "command")
+    command_elem.set("label", "Greenlight")
+    command_elem.text = "bash %ROM%"
+    ET.SubElement(system_elem, "platform").text = "xbox"
+    ET.SubElement(system_elem, "theme").text = "greenlight"
+    ET.indent(systemlist, space="    ")
+    _write_xml(custom_systems_path, systemlist)
+    return True
+
 def load_settings():
     if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _read_json(SETTINGS_FILE)
     return {}
 
 def save_settings(settings):
-    with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump(settings, f, indent=4)
+    _write_json(SETTINGS_FILE, settings, orjson.OPT_INDENT_2)
+
+def save_settings_in_background(settings):
+    try:
+        save_settings(settings)
+    except Exception as e:
+        logging.error(f"Failed to save settings: {e}")
 
 class SyncWorker(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal()
     error = pyqtSignal(str)
-    def __init__(self, base_dir, sh_dir, gamelist_dir):
+    def __init__(self, base_dir, sh_dir, gamelist_dir, download_videos=False):
         super().__init__()
         self.base_dir = base_dir
         self.sh_dir = sh_dir
         self.gamelist_dir = gamelist_dir
+        self.download_videos = download_videos
     def run(self):
         try:
+            last_value = -1
             def progress_callback(value):
-                self.progress.emit(value)
-            asyncio.run(main(
+                nonlocal last_value
+                if value != last_value:
+                    last_value = value
+                    self.progress.emit(value)
+            try:
+                import uvloop
+                run = getattr(uvloop, "run", asyncio.run)
+            except ImportError:
+                run = asyncio.run
+            run(main(
                 base_dir=self.base_dir,
                 rom_dir=self.sh_dir,
                 gamelist_dir=self.gamelist_dir,
+                download_videos=self.download_videos,
                 progress_callback=progress_callback
             ))
             self.finished.emit()
         except Exception as e:
             self.error.emit(str(e))
 
+class CleanWorker(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = paths
+    def run(self):
+        try:
+            files = []
+            dirs = []
+            for p in self.paths:
+                if os.path.isdir(p) and not os.path.islink(p):
+                    files.extend(_collect_files(p))
+                    dirs.append(p)
+                elif os.path.lexists(p):
+                    files.append(p)
+            total = len(files)
+            failed = 0
+            with ThreadPoolExecutor(CLEAN_WORKERS) as pool:
+                for done, removed in enumerate(pool.map(_remove_file, files), 1):
+                    failed += not removed
+                    if done % 100 == 0 or done == total:
+                        self.progress.emit(int(100 * done / total))
+            for d in dirs:
+                shutil.rmtree(d, ignore_errors=True)
+            if failed:
+                logging.warning(f"Clean finished with {failed} of {total} files not deleted")
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+class IntegrateWorker(QThread):
+    finished = pyqtSignal(bool)
+    error = pyqtSignal(str)
+    def __init__(self, custom_systems_path, games_dir):
+        super().__init__()
+        self.custom_systems_path = custom_systems_path
+        self.games_dir = games_dir
+    def run(self):
+        try:
+            self.finished.emit(add_greenlight_system(self.custom_systems_path, self.games_dir))
+        except ET.ParseError as pe:
+            self.error.emit(f"Error parsing es_systems.xml: {pe}")
+        except Exception as e:
+            self.error.emit(f"An error occurred: {e}")
+
 class GreenlightSyncApp(QMainWindow):
     XBOX_GREEN = "#107C10"
     BUTTON_STYLE = f"""
@@ -378,9 +987,14 @@ class GreenlightSyncApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.settings = load_settings()
+        self._http = None
+        self._settings_thread = None
+        self._sync_busy = False
+        self._clean_busy = False
         self.init_ui()
     def open_greenlight_link(self):
         url = "https://flathub.org/apps/io.github.unknownskl.greenlight"
+        import webbrowser
         webbrowser.open(url)
     def browse_folder(self, entry_widget):
         folder = QFileDialog.getExistingDirectory(self, "Select Directory")
@@ -418,10 +1032,10 @@ class GreenlightSyncApp(QMainWindow):
         controls_group.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
         controls_layout = QVBoxLayout(controls_group)
         integrate_layout = QHBoxLayout()
-        integrate_button = QPushButton("Integrate Greenlight with ES-DE")
-        integrate_button.setStyleSheet(self.BUTTON_STYLE)
-        integrate_button.clicked.connect(self.integrate_greenlight)
-        integrate_layout.addWidget(integrate_button)
+        self.integrate_button = QPushButton("Integrate Greenlight with ES-DE")
+        self.integrate_button.setStyleSheet(self.BUTTON_STYLE)
+        self.integrate_button.clicked.connect(self.integrate_greenlight)
+        integrate_layout.addWidget(self.integrate_button)
         modify_theme_button = QPushButton("Modify Theme")
         modify_theme_button.setStyleSheet(self.BUTTON_STYLE)
         modify_theme_button.clicked.connect(self.modify_theme)
@@ -451,10 +1065,10 @@ class GreenlightSyncApp(QMainWindow):
 
         buttons_row = QHBoxLayout()
         buttons_row.addStretch(1)
-        clean_button = QPushButton("Clean All Media")
-        clean_button.setStyleSheet(self.CLEAN_BUTTON_STYLE)
-        clean_button.clicked.connect(self.clean_all_media)
-        buttons_row.addWidget(clean_button)
+        self.clean_button = QPushButton("Clean All Media")
+        self.clean_button.setStyleSheet(self.CLEAN_BUTTON_STYLE)
+        self.clean_button.clicked.connect(self.clean_all_media)
+        buttons_row.addWidget(self.clean_button)
         update_button = QPushButton("Update")
         update_button.setStyleSheet(self.UPDATE_BUTTON_STYLE)
         update_button.clicked.connect(self.update_app)
@@ -516,17 +1130,25 @@ class GreenlightSyncApp(QMainWindow):
         if not theme_folder:
             self.show_info("Modify Theme", "No folder selected.")
             return
-        svg_url = "https://raw.githubusercontent.com/Boc86/xboxgp_esde_sync/main/themes/gp_logo.svg"
-        fanart_url = "https://raw.githubusercontent.com/Boc86/xboxgp_esde_sync/main/themes/gp_fanart.jpg"
-        systems_ok, sys_res = download_file_to_subfolder(theme_folder, ["_inc", "systems"], "greenlight.svg", svg_url)
-        fanart_ok, fanart_res = download_file_to_subfolder(theme_folder, ["_inc", "fanart"], "greenlight.jpg", fanart_url)
+        if self._http is None:
+            self._http = make_http_session()
+        inc_dir = os.path.join(theme_folder, "_inc")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            systems_future = pool.submit(
+                download_file_to_subfolder, self._http, os.path.join(inc_dir, "systems"), "greenlight.svg", THEME_SVG_URL
+            )
+            fanart_future = pool.submit(
+                download_file_to_subfolder, self._http, os.path.join(inc_dir, "fanart"), "greenlight.jpg", THEME_FANART_URL
+            )
+            systems_ok, sys_res = systems_future.result()
+            fanart_ok, fanart_res = fanart_future.result()
         if systems_ok and fanart_ok:
             self.show_info(
                 "Theme Modified",
                 "Greenlight theme assets have been added to the theme. "
                 "Check:\n"
-                f"- {os.path.join(theme_folder, '_inc', 'systems', 'greenlight.svg')}\n"
-                f"- {os.path.join(theme_folder, '_inc', 'fanart', 'greenlight.jpg')}"
+                f"- {sys_res}\n"
+                f"- {fanart_res}"
             )
         else:
             errors = []
@@ -554,60 +1176,35 @@ class GreenlightSyncApp(QMainWindow):
             if not os.path.exists(custom_systems_path):
                 self.show_error("Error", "es_systems.xml not found in the selected folder.")
                 return
-            import xml.etree.ElementTree as ET
-            from xml.dom import minidom
-            try:
-                tree = ET.parse(custom_systems_path)
-                root = tree.getroot()
-            except ET.ParseError as pe:
-                self.show_error("Error", f"Error parsing es_systems.xml: {pe}")
-                return
-            if root.tag.lower() != "systemlist":
-                systemlist = root.find("systemList")
-                if systemlist is None:
-                    systemlist = ET.Element("systemList")
-                    systemlist.extend(list(root))
-                    root = systemlist
-                else:
-                    root = systemlist
-            else:
-                systemlist = root
-            exists = any(
-                system.find('name') is not None and system.find('name').text.strip().lower() == "greenlight"
-                for system in systemlist.findall('system')
-            )
-            if exists:
-                self.show_info("Info", "Greenlight is already integrated into ES-DE.")
-                return
             games_dir = self.sh_folder_entry.text().strip()
             if not games_dir:
                 self.show_error("Error", "Please set the Games Directory in Step 2.")
                 return
-            system_elem = ET.Element("system")
-            ET.SubElement(system_elem, "name").text = "greenlight"
-            ET.SubElement(system_elem, "fullname").text = "Xbox Game Pass"
-            ET.SubElement(system_elem, "path").text = f'bash "{games_dir}"'
-            ET.SubElement(system_elem, "extension").text = ".sh"
-            command_elem = ET.SubElement(system_elem, "command")
-            command_elem.set("label", "Greenlight")
-            command_elem.text = "bash %ROM%"
-            ET.SubElement(system_elem, "platform").text = "xbox"
-            ET.SubElement(system_elem, "theme").text = "greenlight"
-            systemlist.append(system_elem)
-            xmlstr = ET.tostring(systemlist, encoding='utf-8')
-            reparsed = minidom.parseString(xmlstr)
-            pretty_xml = reparsed.toprettyxml(indent="    ")
-            with open(custom_systems_path, "w", encoding="utf-8") as file:
-                file.write(pretty_xml)
-            self.show_info("Success", "Greenlight has been successfully integrated into ES-DE.")
+            self.integrate_button.setEnabled(False)
+            self.integrate_worker = IntegrateWorker(custom_systems_path, games_dir)
+            self.integrate_worker.finished.connect(self.integrate_complete)
+            self.integrate_worker.error.connect(self.integrate_error)
+            self.integrate_worker.start()
         except Exception as e:
             self.show_error("Error", f"An error occurred: {e}")
             logging.error(f"Error in integrate_greenlight: {e}")
+    def integrate_complete(self, added):
+        self.integrate_button.setEnabled(True)
+        if added:
+            self.show_info("Success", "Greenlight has been successfully integrated into ES-DE.")
+        else:
+            self.show_info("Info", "Greenlight is already integrated into ES-DE.")
+    def integrate_error(self, message):
+        self.integrate_button.setEnabled(True)
+        self.show_error("Error", message)
+        logging.error(f"Error in integrate_greenlight: {message}")
     def show_error(self, title, message):
         QMessageBox.critical(self, title, message)
     def show_info(self, title, message):
         QMessageBox.information(self, title, message)
     def start_sync(self):
+        if self._sync_busy or self._clean_busy:
+            return
         base_dir = self.folder_entry.text().strip()
         sh_dir = self.sh_folder_entry.text().strip()
         gamelist_dir = self.gamelist_folder_entry.text().strip()
@@ -620,12 +1217,19 @@ class GreenlightSyncApp(QMainWindow):
         self.settings["base_dir"] = base_dir
         self.settings["sh_dir"] = sh_dir
         self.settings["gamelist_dir"] = gamelist_dir
-        save_settings(self.settings)
+        if self._settings_thread is not None:
+            self._settings_thread.join()
+        self._settings_thread = threading.Thread(
+            target=save_settings_in_background, args=(dict(self.settings),), daemon=True
+        )
+        self._settings_thread.start()
         self.progress.setValue(0)
         self.status_label.setText("Status: Sync in progress...")
         self.status_label.setStyleSheet("color: #e0e0e0; font-size: 10pt;")
+        self._sync_busy = True
         self.start_button.setEnabled(False)
-        self.worker = SyncWorker(base_dir, sh_dir, gamelist_dir)
+        self.clean_button.setEnabled(False)
+        self.worker = SyncWorker(base_dir, sh_dir, gamelist_dir, self.settings.get("download_videos", False))
         self.worker.progress.connect(self.progress.setValue)
         self.worker.finished.connect(self.sync_complete)
         self.worker.error.connect(self.sync_error)
@@ -634,19 +1238,43 @@ class GreenlightSyncApp(QMainWindow):
         self.status_label.setText("Status: Sync complete!")
         self.status_label.setStyleSheet("color: #4CAF50; font-size: 10pt;")
         self.progress.setValue(100)
+        self._sync_busy = False
         self.start_button.setEnabled(True)
+        self.clean_button.setEnabled(True)
     def sync_error(self, message):
         self.status_label.setText(f"Sync error: {message}")
         self.status_label.setStyleSheet("color: #ff3333; font-size: 10pt;")
         self.progress.setValue(0)
+        self._sync_busy = False
         self.start_button.setEnabled(True)
+        self.clean_button.setEnabled(True)
     def clean_all_media(self):
+        if self._sync_busy or self._clean_busy:
+            return
         base_dir = self.folder_entry.text().strip()
         sh_dir = self.sh_folder_entry.text().strip()
         gamelist_dir = self.gamelist_folder_entry.text().strip()
-        base_dir = ensure_greenlight_subdir(base_dir)
-        sh_dir = ensure_greenlight_subdir(sh_dir)
-        gamelist_dir = ensure_greenlight_subdir(gamelist_dir)
+        base_dir = greenlight_subdir(base_dir)
+        sh_dir = greenlight_subdir(sh_dir)
+        gamelist_dir = greenlight_subdir(gamelist_dir)
+        paths_to_clean = [
+            p for p in [
+                os.path.join(base_dir, "marquees"),
+                os.path.join(base_dir, "covers"),
+                os.path.join(base_dir, "fanart"),
+                os.path.join(base_dir, "videos"),
+                os.path.join(base_dir, IMAGE_INDEX_FILENAME),
+                os.path.join(base_dir, MISSING_INDEX_FILENAME),
+                sh_dir,
+                gamelist_dir,
+                CACHE_FILE,
+                CACHE_VALIDATORS_FILE,
+                CACHE_IDHASH_FILE
+            ] if os.path.lexists(p)
+        ]
+        if not paths_to_clean:
+            self.show_info("Nothing to Clean", "No Greenlight media or data was found.")
+            return
         reply = QMessageBox.question(
             self,
             "Confirm Clean",
@@ -654,21 +1282,31 @@ class GreenlightSyncApp(QMainWindow):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            paths_to_clean = [
-                os.path.join(base_dir, "marquees"),
-                os.path.join(base_dir, "covers"),
-                os.path.join(base_dir, "fanart"),
-                sh_dir,
-                gamelist_dir,
-                CACHE_FILE,
-                CACHE_TIMESTAMP_FILE
-            ]
-            for p in paths_to_clean:
-                if os.path.isdir(p):
-                    shutil.rmtree(p, ignore_errors=True)
-                elif os.path.isfile(p):
-                    os.remove(p)
-            self.show_info("Clean Complete", "All Greenlight media and data have been deleted.")
+            self.progress.setValue(0)
+            self.status_label.setText("Status: Cleaning media...")
+            self.status_label.setStyleSheet("color: #e0e0e0; font-size: 10pt;")
+            self._clean_busy = True
+            self.start_button.setEnabled(False)
+            self.clean_button.setEnabled(False)
+            self.clean_worker = CleanWorker(paths_to_clean)
+            self.clean_worker.progress.connect(self.progress.setValue)
+            self.clean_worker.finished.connect(self.clean_complete)
+            self.clean_worker.error.connect(self.clean_error)
+            self.clean_worker.start()
+    def clean_complete(self):
+        self.status_label.setText("Status: Clean complete!")
+        self.status_label.setStyleSheet("color: #4CAF50; font-size: 10pt;")
+        self._clean_busy = False
+        self.start_button.setEnabled(True)
+        self.clean_button.setEnabled(True)
+        self.show_info("Clean Complete", "All Greenlight media and data have been deleted.")
+    def clean_error(self, message):
+        self.status_label.setText(f"Clean error: {message}")
+        self.status_label.setStyleSheet("color: #ff3333; font-size: 10pt;")
+        self.progress.setValue(0)
+        self._clean_busy = False
+        self.start_button.setEnabled(True)
+        self.clean_button.setEnabled(True)
     def update_app(self):
         import platform
         from PyQt5.QtWidgets import QApplication